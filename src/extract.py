@@ -1,165 +1,1208 @@
-import fitz  # PyMuPDF
-import json
+import argparse
+import asyncio
+import atexit
+import contextlib
+import functools
+import hashlib
+import io
+import itertools
+import logging
+import mmap
+import multiprocessing
+import orjson
 import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from logging.handlers import QueueHandler, QueueListener
 from dotenv import load_dotenv
 from pathlib import Path
-from langchain_openai import ChatOpenAI # Connects to OpenAI API
-from langchain.prompts import ChatPromptTemplate # Structured prompts for LLMs
-from langchain_core.output_parsers import JsonOutputParser # Parses JSON output from LLMs
-from jsonschema import validate, ValidationError
+from jsonschema.exceptions import SchemaError
+from jsonschema.validators import validator_for
+
+try:
+    import pypdfium2 as pdfium  # Optional, faster PDF text extraction
+except ImportError:
+    pdfium = None
+
+try:
+    import jsonschema_rs  # Optional, Rust-backed schema validator
+except ImportError:
+    jsonschema_rs = None
+
+try:
+    import fastjsonschema  # Optional, code-generated schema validator
+except ImportError:
+    fastjsonschema = None
 
 # Load environment variables
 load_dotenv()
 
-class RecipeExtractor:
-    def __init__(self, recipe_schema, prompt_template):
-        """Initialize the recipe extractor with LangChain components"""
-        self.llm = ChatOpenAI(
-            model="gpt-5",
-            temperature=1,  # GPT-5 only supports default temperature (1)
-            api_key=os.getenv('OPENAI_API_KEY')
+logger = logging.getLogger(__name__)
+
+# NDJSON log of every status message, one JSON object per line
+LOG_PATH = Path("run.log")
+
+# Queue carrying log records from all processes to the main process's
+# listener; set by setup_logging()
+_log_queue = None
+_log_listener = None
+
+# Written after each page's text so long recipes can be split on page
+# boundaries; starts with a newline so the last line of one page never runs
+# into the first line of the next
+PAGE_BREAK = "\n\f"
+
+
+class JSONLinesFormatter(logging.Formatter):
+    """Format log records as one JSON object per line (NDJSON)
+
+    Fields passed through `extra=` (e.g. event, file) are included as keys.
+    """
+
+    # Attributes every LogRecord has; anything else came in through `extra=`
+    STANDARD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message"}
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "process": record.processName,
+            "message": record.getMessage()
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in self.STANDARD_ATTRS)
+        return orjson.dumps(entry, default=str).decode()
+
+
+def setup_logging(log_path=LOG_PATH):
+    """Send all log records through a queue to the console and an NDJSON log file
+
+    Returns the started QueueListener; stop it to flush the log on exit.
+    """
+    global _log_queue, _log_listener
+    
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(logging.Formatter("%(message)s"))
+    file_handler = logging.FileHandler(log_path)
+    file_handler.setFormatter(JSONLinesFormatter())
+    
+    _log_queue = multiprocessing.Queue()
+    listener = QueueListener(_log_queue, console_handler, file_handler)
+    listener.start()
+    _log_listener = listener
+    
+    init_worker_logging(_log_queue)
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # Skip per-request logs
+    return listener
+
+
+def flush_logging():
+    """Wait until every queued log record has been written
+
+    Call before printing to stdout directly, so the output lands after the
+    status messages logged before it instead of interleaving with them.
+    """
+    if _log_listener is not None:
+        # stop() drains the queue and joins the listener thread
+        _log_listener.stop()
+        _log_listener.start()
+
+
+def init_worker_logging(log_queue):
+    """Route this process's log records into the shared log queue"""
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))
+    logging.basicConfig(level=logging.INFO, handlers=[queue_handler], force=True)
+
+
+def create_process_pool(max_workers):
+    """Create a process pool whose workers log through the shared log queue"""
+    if _log_queue is None:
+        return ProcessPoolExecutor(max_workers=max_workers)
+    return ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker_logging,
+                               initargs=(_log_queue,))
+
+
+def _extract_text_pypdfium2(pdf_path, page_range=None):
+    """Extract text from PDF using pypdfium2, optionally only pages [start, stop)"""
+    buf = io.StringIO()
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        for index in range(*(page_range or (0, len(pdf)))):
+            page = pdf[index]
+            textpage = page.get_textpage()
+            buf.write(textpage.get_text_range().replace("\r\n", "\n"))
+            buf.write(PAGE_BREAK)
+            textpage.close()
+            page.close()
+    finally:
+        pdf.close()
+    return buf.getvalue()
+
+
+def _extract_text_fitz(pdf_path, page_range=None):
+    """Extract text from PDF using PyMuPDF, optionally only pages [start, stop)"""
+    import fitz  # PyMuPDF
+    
+    buf = io.StringIO()
+    with fitz.open(pdf_path) as doc:
+        for page in doc.pages(*(page_range or ())):
+            buf.write(page.get_text())
+            buf.write(PAGE_BREAK)
+    return buf.getvalue()
+
+
+def extract_text_from_pdf(pdf_path, page_range=None):
+    """Extract text from PDF, using pypdfium2 when installed and PyMuPDF otherwise"""
+    if pdfium is not None:
+        try:
+            return _extract_text_pypdfium2(pdf_path, page_range).strip()
+        except Exception as e:
+            logger.warning(f"pypdfium2 failed on {pdf_path}, falling back to PyMuPDF: {e}",
+                           extra={"event": "extract_fallback", "file": str(pdf_path)})
+    
+    try:
+        return _extract_text_fitz(pdf_path, page_range).strip()
+    except Exception as e:
+        logger.error(f"Error extracting text from {pdf_path}: {e}",
+                     extra={"event": "extract_error", "file": str(pdf_path)})
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def count_pages(pdf_path):
+    """Return a PDF's page count (0 if it can't be opened), probed once per file"""
+    import fitz  # PyMuPDF
+    
+    try:
+        with fitz.open(pdf_path) as doc:
+            return doc.page_count
+    except Exception:
+        return 0
+
+
+def pick_strategy(pdf_path):
+    """Pick how to extract a PDF's text from its page count (see STRATEGY_RULES)"""
+    page_count = count_pages(pdf_path)
+    for max_pages, strategy in STRATEGY_RULES:
+        if max_pages is None or page_count <= max_pages:
+            return strategy
+
+
+@contextlib.contextmanager
+def extraction_executors(pdf_files):
+    """Yield (process_pool, inline_executor) for extracting pdf_files
+
+    The process pool is only started when some PDF is too big for inline
+    extraction. The inline executor has a single thread because neither
+    MuPDF nor PDFium is thread-safe.
+    """
+    needs_pool = any(pick_strategy(pdf_file) != "inline" for pdf_file in pdf_files)
+    with ThreadPoolExecutor(max_workers=1) as inline_executor:
+        if not needs_pool:
+            yield None, inline_executor
+            return
+        with create_process_pool(os.cpu_count()) as process_pool:
+            yield process_pool, inline_executor
+
+
+async def extract_with_strategy(pdf_file, process_pool, inline_executor):
+    """Extract a PDF's text with the strategy picked for its page count"""
+    loop = asyncio.get_running_loop()
+    strategy = pick_strategy(pdf_file)
+    
+    if strategy == "inline" or process_pool is None:
+        return await loop.run_in_executor(inline_executor, extract_text_from_pdf, pdf_file)
+    if strategy == "process":
+        return await loop.run_in_executor(process_pool, extract_text_from_pdf, pdf_file)
+    
+    # Split a huge PDF into page ranges extracted in parallel
+    page_count = count_pages(pdf_file)
+    range_size = -(-page_count // (os.cpu_count() or 1))
+    parts = await asyncio.gather(*[
+        loop.run_in_executor(process_pool, extract_text_from_pdf, pdf_file,
+                             (start, min(start + range_size, page_count)))
+        for start in range(0, page_count, range_size)
+    ])
+    if any(part is None for part in parts):
+        return None
+    return PAGE_BREAK.join(parts)
+
+
+# Schema, prompt and data locations
+SCHEMA_PATH = Path("schema/schema.json")
+PROMPT_PATH = Path("prompts/recipe_extraction_prompt.txt")
+PDF_DIR = Path("data/input")
+OUTPUT_DIR = Path("data/output")
+
+# Output JSON key holding the hash of the PDF it was extracted from
+PDF_HASH_KEY = "_pdf_hash"
+
+# PDFs larger than this are hashed through a memory map instead of being
+# read into memory; below it the mapping costs more than the copy
+MMAP_HASH_THRESHOLD = 1 << 20
+
+# Most schema errors reported for one recipe; a badly broken reply can
+# produce hundreds, and finding them all is wasted work
+MAX_SCHEMA_ERRORS = 20
+
+# Extraction strategy by PDF page count, as (max pages, strategy):
+# - inline: tiny PDFs are extracted in the main process, since a round trip
+#   to a worker process costs more than the extraction itself
+# - process: one PDF per task in the process pool
+# - split: huge PDFs are split into page ranges across the process pool
+STRATEGY_RULES = (
+    (10, "inline"),
+    (200, "process"),
+    (None, "split"),
+)
+
+# Upper bound on in-flight LLM requests
+MAX_CONCURRENT_REQUESTS = 20
+
+# Coroutines pulling extracted text and calling the LLM in the pipeline
+NUM_LLM_WORKERS = MAX_CONCURRENT_REQUESTS
+
+# Connection pool limits shared by all LLM requests
+MAX_HTTP_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 50
+
+# Account rate limits the scheduler keeps requests under
+MAX_REQUESTS_PER_MINUTE = 500
+MAX_TOKENS_PER_MINUTE = 200_000
+
+# After a 429, run at half the rate limits for this long
+RATE_LIMIT_COOLDOWN_SECONDS = 15
+
+# Attempts per request before giving up on rate limit / transient API errors
+MAX_REQUEST_ATTEMPTS = 5
+
+# Backoff before retrying a connection or 5xx error, doubled on each attempt
+RETRY_BACKOFF_SECONDS = 1
+
+# OpenAI Batch API settings
+BATCH_INPUT_PATH = Path("data/batch_input.jsonl")
+BATCH_POLL_INTERVAL_SECONDS = 60
+BATCH_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+# The shared LLM client has SDK retries off (the scheduler retries instead),
+# so batch calls, which bypass the scheduler, get their own
+BATCH_CLIENT_MAX_RETRIES = 5
+
+# LangChain message types -> OpenAI chat roles
+MESSAGE_ROLES = {"system": "system", "human": "user", "ai": "assistant"}
+
+# Prompt token budget when packing several recipes into one request (--combine)
+MAX_COMBINED_PROMPT_TOKENS = 8000
+
+# Extra system instructions for requests that carry several recipes
+MULTI_RECIPE_INSTRUCTIONS = """The input contains multiple recipes. Each one starts with a <<RECIPE id=...>> line and ends with a matching <<END RECIPE id=...>> line.
+Extract every recipe independently and return one element per recipe in "recipes":
+{{"recipes": [{{"id": "<recipe id>", "recipe": {{...JSON matching the schema...}}}}, ...]}}"""
+
+# Recipes longer than this many characters are extracted page chunk by page
+# chunk and merged (map-reduce) instead of in a single request
+LONG_RECIPE_CHARS = 8000
+
+# Extra system instructions for one chunk of a long recipe
+PARTIAL_RECIPE_INSTRUCTIONS = """The input is part {part} of {parts} of a longer recipe document.
+Extract only what appears in this part: its components with their ingredients, and any allergens it mentions.
+If the recipe name, chef or yield are not shown in this part, return an empty string or 0 for them."""
+
+# Model used when OPENAI_MODEL is not set
+DEFAULT_MODEL = "gpt-4o-mini"
+
+
+def list_pdfs(pdf_dir):
+    """List the PDF files directly inside pdf_dir (none if it doesn't exist)"""
+    # os.scandir is much cheaper than Path.glob on large directories: no
+    # pattern matching, and the file type comes from the directory listing
+    try:
+        with os.scandir(pdf_dir) as entries:
+            return [
+                Path(entry.path) for entry in entries
+                if entry.name.endswith(".pdf") and entry.is_file()
+            ]
+    except FileNotFoundError:
+        return []
+
+
+@functools.lru_cache(maxsize=1)
+def config_fingerprint(schema_path=SCHEMA_PATH, prompt_path=PROMPT_PATH):
+    """Return a hash of the schema and prompt, which shape every extraction"""
+    h = hashlib.blake2b(digest_size=16)
+    for path in (schema_path, prompt_path):
+        try:
+            h.update(Path(path).read_bytes())
+        except OSError:
+            pass  # Reported when the file is actually loaded
+    return h.digest()
+
+
+def hash_pdf(pdf_path):
+    """Return a content hash of a PDF, stored with its output to detect changes
+
+    The schema and prompt are mixed in, so editing either re-extracts every PDF.
+    """
+    pdf_path = Path(pdf_path)
+    if pdf_path.stat().st_size > MMAP_HASH_THRESHOLD:
+        with open(pdf_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            h = hashlib.blake2b(mm, digest_size=16)
+    else:
+        h = hashlib.blake2b(pdf_path.read_bytes(), digest_size=16)
+    h.update(config_fingerprint())
+    return h.hexdigest()
+
+
+def is_output_current(output_path, pdf_hash):
+    """Check whether output_path was already extracted from a PDF with this hash"""
+    try:
+        return orjson.loads(Path(output_path).read_bytes()).get(PDF_HASH_KEY) == pdf_hash
+    except (OSError, ValueError, AttributeError):
+        return False
+
+
+@functools.lru_cache(maxsize=1)
+def load_schema(schema_path=SCHEMA_PATH):
+    """Load the recipe JSON schema (read from disk once per process)
+
+    schema/schema.json is the single source of truth for the recipe shape, so
+    there is no built-in fallback schema. The schema is checked against its
+    metaschema here, once, so a broken schema stops the run up front.
+    """
+    try:
+        schema = orjson.loads(Path(schema_path).read_bytes())
+        validator_for(schema).check_schema(schema)
+        return schema
+    except FileNotFoundError:
+        logger.error("⚠️  schema.json not found")
+        raise FileNotFoundError(f"{schema_path} not found")
+    except orjson.JSONDecodeError as e:
+        logger.error(f"⚠️  schema.json is not valid JSON: {e}")
+        raise
+    except SchemaError as e:
+        logger.error(f"⚠️  schema.json is not a valid JSON Schema: {e.message}")
+        raise
+
+
+@functools.lru_cache(maxsize=1)
+def load_prompt_template(prompt_path=PROMPT_PATH):
+    """Load the extraction prompt and build its chat template (once per process)"""
+    from langchain.prompts import ChatPromptTemplate # Structured prompts for LLMs
+    
+    try:
+        with open(prompt_path, 'r') as f:
+            prompt_text = f.read()
+    except FileNotFoundError:
+        logger.error("⚠️  recipe_extraction_prompt.txt not found")
+        prompt_text = None
+    
+    if not prompt_text:
+        raise FileNotFoundError(f"{prompt_path} not found")
+    
+    # Create the prompt template using the loaded text with schema parameter
+    return ChatPromptTemplate.from_messages([
+        ("system", prompt_text),
+        ("human", "{recipe_text}")
+    ])
+
+
+@functools.lru_cache(maxsize=1)
+def get_http_client():
+    """Return the async HTTP client shared by all LLM requests in this process"""
+    import httpx
+    
+    return httpx.AsyncClient(limits=httpx.Limits(
+        max_connections=MAX_HTTP_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS
+    ))
+
+
+@functools.lru_cache(maxsize=1)
+def get_llm():
+    """Return the ChatOpenAI client shared by all extractors in this process"""
+    from langchain_openai import ChatOpenAI # Connects to OpenAI API
+    
+    return ChatOpenAI(
+        model=os.getenv('OPENAI_MODEL', DEFAULT_MODEL),
+        temperature=1,  # Default temperature; GPT-5 models only support 1
+        api_key=os.getenv('OPENAI_API_KEY'),
+        max_retries=0,  # Retries are handled by the scheduler
+        http_async_client=get_http_client()
+    )
+
+
+async def close_http_client():
+    """Close the shared HTTP client, if it was created
+
+    Must run on the event loop that used it, so this is awaited at the end of
+    each async run rather than registered with atexit.
+    """
+    if get_http_client.cache_info().currsize:
+        await get_http_client().aclose()
+        get_http_client.cache_clear()
+        get_llm.cache_clear()
+
+
+def split_pages(text, max_chars):
+    """Split extracted PDF text into chunks of whole pages, each at most max_chars
+
+    A single page longer than max_chars becomes a chunk on its own.
+    """
+    chunks = []
+    chunk = ""
+    for page in text.split(PAGE_BREAK):
+        page = page.strip()
+        if not page:
+            continue
+        if chunk and len(chunk) + len(page) + 1 > max_chars:
+            chunks.append(chunk)
+            chunk = ""
+        chunk = f"{chunk}\n{page}" if chunk else page
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def merge_partial_recipes(partials):
+    """Merge recipes extracted from consecutive chunks of one document
+
+    Name, chef and yield come from the first chunk that has them (normally
+    page 1), allergens are unioned case-insensitively (keeping the first
+    spelling) and components concatenated. A component
+    named again in a later chunk (its ingredient list ran across the chunk
+    boundary) is merged into the first one, adding ingredients not already
+    listed.
+    """
+    merged = dict(partials[0])
+    for field in ("recipe_name", "chef", "yield_count"):
+        merged[field] = next((partial[field] for partial in partials if partial.get(field)), merged.get(field))
+    
+    # Each chunk is a separate LLM call, so spellings can differ ("Fish"/"fish")
+    allergens = {}
+    for partial in partials:
+        for allergen in partial.get("allergens", []):
+            allergens.setdefault(allergen.strip().lower(), allergen)
+    merged["allergens"] = list(allergens.values())
+    
+    def key(item):
+        return item.get("name", "").strip().lower()
+    
+    components = {}
+    for partial in partials:
+        for component in partial.get("components", []):
+            first = components.get(key(component))
+            if first is None:
+                components[key(component)] = {**component, "ingredients": list(component.get("ingredients", []))}
+                continue
+            listed = {key(ingredient) for ingredient in first["ingredients"]}
+            first["ingredients"].extend(
+                ingredient for ingredient in component.get("ingredients", [])
+                if key(ingredient) not in listed
+            )
+    merged["components"] = list(components.values())
+    return merged
+
+
+def compile_fast_check(schema):
+    """Compile a fast pass/fail check for schema, or return None
+
+    Prefers jsonschema-rs (native code), then fastjsonschema (generated
+    Python), depending on which is installed.
+    """
+    if jsonschema_rs is not None:
+        return jsonschema_rs.validator_for(schema).is_valid
+    if fastjsonschema is not None:
+        validate = fastjsonschema.compile(schema)
+        
+        def is_valid(data):
+            try:
+                validate(data)
+                return True
+            except fastjsonschema.JsonSchemaException:
+                return False
+        return is_valid
+    return None
+
+
+def to_strict_schema(schema):
+    """Return a copy of a JSON schema that meets OpenAI structured outputs' strict mode
+
+    Strict mode requires every object to list all of its properties as
+    required and to forbid additional properties.
+    """
+    if isinstance(schema, list):
+        return [to_strict_schema(item) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+    
+    strict_schema = {key: to_strict_schema(value) for key, value in schema.items()}
+    if strict_schema.get("type") == "object" and "properties" in strict_schema:
+        strict_schema["required"] = list(strict_schema["properties"])
+        strict_schema["additionalProperties"] = False
+    return strict_schema
+
+
+def json_schema_response_format(name, schema):
+    """Build a structured outputs response_format that constrains replies to schema"""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": name, "schema": to_strict_schema(schema), "strict": True}
+    }
+
+
+class APIRequestScheduler:
+    """Token-bucket scheduler that keeps LLM requests under the RPM/TPM limits
+
+    Ported from the OpenAI cookbook's api_request_parallel_processor.py: request
+    and token capacity refill continuously at RPM/60 and TPM/60 per second, and
+    a request is only dispatched once both buckets can admit it.
+    """
+
+    def __init__(self, max_requests_per_minute=MAX_REQUESTS_PER_MINUTE,
+                 max_tokens_per_minute=MAX_TOKENS_PER_MINUTE,
+                 max_concurrency=MAX_CONCURRENT_REQUESTS):
+        self.max_requests_per_minute = max_requests_per_minute
+        self.max_tokens_per_minute = max_tokens_per_minute
+        self.available_request_capacity = max_requests_per_minute
+        self.available_token_capacity = max_tokens_per_minute
+        self.last_update_time = time.monotonic()
+        self.cooldown_until = 0.0
+        
+        # Dispatch requests in FIFO order and bound how many are in flight
+        self.dispatch_lock = asyncio.Lock()
+        self.concurrency = asyncio.Semaphore(max_concurrency)
+        
+        # Counters
+        self.scheduled = 0
+        self.in_flight = 0
+        self.rate_limited = 0
+
+    def _current_limits(self):
+        """Return the (RPM, TPM) limits, halved while cooling down after a 429"""
+        if time.monotonic() < self.cooldown_until:
+            return self.max_requests_per_minute / 2, self.max_tokens_per_minute / 2
+        return self.max_requests_per_minute, self.max_tokens_per_minute
+
+    def _refill(self):
+        """Refill both buckets for the time elapsed since the last update"""
+        now = time.monotonic()
+        elapsed = now - self.last_update_time
+        self.last_update_time = now
+        
+        requests_per_minute, tokens_per_minute = self._current_limits()
+        self.available_request_capacity = min(
+            self.available_request_capacity + requests_per_minute * elapsed / 60,
+            requests_per_minute
+        )
+        self.available_token_capacity = min(
+            self.available_token_capacity + tokens_per_minute * elapsed / 60,
+            tokens_per_minute
         )
-        self.output_parser = JsonOutputParser()
+
+    async def _acquire(self, token_estimate):
+        """Wait until both buckets admit a request costing token_estimate tokens"""
+        async with self.dispatch_lock:
+            while True:
+                self._refill()
+                _, tokens_per_minute = self._current_limits()
+                tokens = min(token_estimate, tokens_per_minute)
+                if self.available_request_capacity >= 1 and self.available_token_capacity >= tokens:
+                    self.available_request_capacity -= 1
+                    self.available_token_capacity -= tokens
+                    return
+                
+                # Sleep roughly until enough capacity has refilled
+                requests_per_minute, tokens_per_minute = self._current_limits()
+                wait = max(
+                    (1 - self.available_request_capacity) * 60 / requests_per_minute,
+                    (tokens - self.available_token_capacity) * 60 / tokens_per_minute,
+                    0.01
+                )
+                await asyncio.sleep(wait)
+
+    def _record_rate_limit(self):
+        """Halve the local limits for a cool-down window after a 429"""
+        self.rate_limited += 1
+        self.cooldown_until = time.monotonic() + RATE_LIMIT_COOLDOWN_SECONDS
+        self.available_request_capacity = min(self.available_request_capacity, 0)
+        logger.warning(f"Rate limited, throttling for {RATE_LIMIT_COOLDOWN_SECONDS}s ({self.status()})",
+                       extra={"event": "rate_limited", **self.counters()})
+
+    def counters(self):
+        """Return the scheduler counters"""
+        return {"scheduled": self.scheduled, "in_flight": self.in_flight, "rate_limited": self.rate_limited}
+
+    def status(self):
+        """Return the scheduler counters as a printable string"""
+        return (f"scheduled: {self.scheduled}, in flight: {self.in_flight}, "
+                f"rate limited: {self.rate_limited}")
+
+    async def run(self, make_request, token_estimate):
+        """Run make_request() once the rate limits admit it, retrying 429s and transient errors"""
+        from openai import APIConnectionError, InternalServerError, RateLimitError
+        
+        self.scheduled += 1
+        for attempt in range(1, MAX_REQUEST_ATTEMPTS + 1):
+            backoff = 0
+            await self._acquire(token_estimate)
+            async with self.concurrency:
+                self.in_flight += 1
+                try:
+                    return await make_request()
+                except RateLimitError:
+                    self._record_rate_limit()
+                    if attempt == MAX_REQUEST_ATTEMPTS:
+                        raise
+                except (APIConnectionError, InternalServerError) as e:
+                    if attempt == MAX_REQUEST_ATTEMPTS:
+                        raise
+                    backoff = RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1)
+                    logger.warning(f"{type(e).__name__}, retrying in {backoff}s "
+                                   f"(attempt {attempt}/{MAX_REQUEST_ATTEMPTS})")
+                finally:
+                    self.in_flight -= 1
+            
+            # Back off outside the concurrency slot so other requests can run
+            if backoff:
+                await asyncio.sleep(backoff)
+
+
+class RecipeExtractor:
+    def __init__(self, recipe_schema=None, prompt_template=None, scheduler=None, fail_fast=False):
+        """Initialize the recipe extractor with LangChain components
+
+        The schema and prompt template default to the cached project files.
+        With fail_fast, validation stops at (and logs) the first schema error.
+        """
+        if recipe_schema is None:
+            recipe_schema = load_schema()
+        if prompt_template is None:
+            prompt_template = load_prompt_template()
+
+        # LangChain and OpenAI are imported lazily so the CLI starts fast
+        self.llm = get_llm()
         
         # Set schema and prompt template
         self.recipe_schema = recipe_schema
         self.prompt_template = prompt_template
+        
+        # The schema never changes after init, so serialize it for the prompt once
+        self.schema_json = orjson.dumps(recipe_schema, option=orjson.OPT_INDENT_2).decode()
+        
+        # Compile the schema validator once instead of on every validation,
+        # using the draft the schema declares ($schema, else the latest)
+        self.validator = validator_for(recipe_schema)(recipe_schema)
+        self.is_valid = compile_fast_check(recipe_schema)
+        self.multi_recipe_prompt_template = prompt_template + [("system", MULTI_RECIPE_INSTRUCTIONS)]
+        self.partial_recipe_prompt_template = prompt_template + [("system", PARTIAL_RECIPE_INSTRUCTIONS)]
+        
+        # Constrain replies to the schema server-side (OpenAI structured outputs)
+        self.response_format = json_schema_response_format("recipe", recipe_schema)
+        self.multi_recipe_response_format = json_schema_response_format("recipes", {
+            "type": "object",
+            "properties": {
+                "recipes": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {"id": {"type": "string"}, "recipe": recipe_schema}
+                    }
+                }
+            }
+        })
+        
+        # Keep LLM requests under the account's rate limits
+        self.scheduler = scheduler or APIRequestScheduler()
+        self.fail_fast = fail_fast
+        self.prompt_token_estimate = len(
+            prompt_template.format(json_schema=self.schema_json, recipe_text="")
+        ) // 4
 
-    def extract_text_from_pdf(self, pdf_path):
-        """Extract text from PDF using PyMuPDF"""
-        try:
-            with fitz.open(pdf_path) as doc:
-                text = "\n".join([page.get_text() for page in doc])
-                return text.strip()
-        except Exception as e:
-            print(f"Error extracting text from {pdf_path}: {e}")
-            return None
-
-    def parse_recipe_text(self, text):
-        """Parse recipe text using LangChain and GPT-5 with schema validation"""
+    async def parse_recipe_text(self, text):
+        """Parse recipe text using LangChain with structured outputs and schema validation"""
+        if len(text) > LONG_RECIPE_CHARS:
+            return await self.parse_long_recipe_text(text)
+        
         try:
-            # Create the chain with schema validation
-            chain = self.prompt_template | self.llm | self.output_parser
+            # Create the chain, constraining the reply to the schema
+            chain = self.prompt_template | self.llm.bind(response_format=self.response_format)
             
             # Prepare the input parameters
             input_params = {
-                "json_schema": json.dumps(self.recipe_schema, indent=2),
+                "json_schema": self.schema_json,
                 "recipe_text": text
             }
             
-            # Run the chain with schema
-            result = chain.invoke(input_params)
+            # Run the chain with schema once the rate limits admit it
+            token_estimate = self.prompt_token_estimate + len(text) // 4
+            message = await self.scheduler.run(lambda: chain.ainvoke(input_params), token_estimate)
+            result = orjson.loads(message.content)
             
             # Validate the result against schema
-            validate(instance=result, schema=self.recipe_schema)
+            if not self.validate_recipe_data(result):
+                return None
             return result
-        except ValidationError as e:
-            print(f"Schema validation error: {e.message}")
-            print(f"Path: {' -> '.join(str(p) for p in e.path)}")
-            return None
         except Exception as e:
-            print(f"Error parsing recipe text: {e}")
+            logger.error(f"Error parsing recipe text: {e}")
             return None
 
-    def process_recipe(self, pdf_path):
-        """Process a single recipe PDF"""
-        print(f"Processing: {pdf_path}")
+    async def parse_long_recipe_text(self, text):
+        """Parse a long recipe by map-reducing over chunks of its pages
+
+        Each chunk is extracted as a partial recipe concurrently, then the
+        partial recipes are merged client-side and validated as a whole.
+        """
+        chunks = split_pages(text, LONG_RECIPE_CHARS)
+        chain = self.partial_recipe_prompt_template | self.llm.bind(response_format=self.response_format)
         
-        # Extract text from PDF
-        text = self.extract_text_from_pdf(pdf_path)
-        if not text:
-            print(f"Failed to extract text from {pdf_path}")
-            return None
+        async def parse_chunk(part, chunk):
+            input_params = {
+                "json_schema": self.schema_json,
+                "recipe_text": chunk,
+                "part": part,
+                "parts": len(chunks)
+            }
+            token_estimate = self.prompt_token_estimate + len(chunk) // 4
+            message = await self.scheduler.run(lambda: chain.ainvoke(input_params), token_estimate)
+            return orjson.loads(message.content)
         
-        # Parse the recipe text
-        result = self.parse_recipe_text(text)
+        try:
+            partials = await asyncio.gather(*[
+                parse_chunk(part, chunk) for part, chunk in enumerate(chunks, start=1)
+            ])
+        except Exception as e:
+            logger.error(f"Error parsing recipe text: {e}")
+            return None
         
-        if result:
-            return result
-        else:
-            print(f"Failed to parse recipe from {pdf_path}")
+        result = merge_partial_recipes(partials)
+        if not self.validate_recipe_data(result):
             return None
+        return result
+
+    async def parse_recipe_batch(self, texts):
+        """Parse several recipe texts with a single LLM request
+
+        Sends the system prompt once for all recipes. Returns one result per
+        text, None for recipes that failed to parse or validate.
+        """
+        try:
+            chain = self.multi_recipe_prompt_template | self.llm.bind(
+                response_format=self.multi_recipe_response_format
+            )
+            
+            # Wrap each recipe in id-tagged delimiters
+            recipe_text = "\n\n".join(
+                f"<<RECIPE id={i}>>\n{text}\n<<END RECIPE id={i}>>"
+                for i, text in enumerate(texts)
+            )
+            input_params = {
+                "json_schema": self.schema_json,
+                "recipe_text": recipe_text
+            }
+            
+            token_estimate = self.prompt_token_estimate + len(recipe_text) // 4
+            message = await self.scheduler.run(lambda: chain.ainvoke(input_params), token_estimate)
+            response = orjson.loads(message.content)
+        except Exception as e:
+            logger.error(f"Error parsing recipe batch: {e}")
+            return [None] * len(texts)
+        
+        # Route each returned recipe back to its text by id
+        recipes = {str(item["id"]): item["recipe"] for item in response["recipes"]}
+        
+        results = []
+        for i in range(len(texts)):
+            recipe = recipes.get(str(i))
+            if recipe is None:
+                logger.error(f"Recipe {i} missing from batch response")
+            elif not self.validate_recipe_data(recipe):
+                recipe = None
+            results.append(recipe)
+        return results
+
+    def validate_recipe_data(self, data, fail_fast=None):
+        """Validate parsed recipe data against the schema, printing its errors
+
+        Up to MAX_SCHEMA_ERRORS errors are printed. With fail_fast (defaults
+        to the extractor's setting), only the first error is found and printed.
+        """
+        if fail_fast is None:
+            fail_fast = self.fail_fast
+        
+        # Valid data (the common case) passes the generated validator quickly;
+        # jsonschema is only needed to report the errors on failure
+        if self.is_valid is not None and self.is_valid(data):
+            return True
+        
+        # iter_errors is lazy, so capping it also stops the validation work
+        max_errors = 1 if fail_fast else MAX_SCHEMA_ERRORS
+        errors = list(itertools.islice(self.validator.iter_errors(data), max_errors))
+        if errors:
+            # One log record per recipe rather than two per error
+            paths = [' -> '.join(str(p) for p in error.path) for error in errors]
+            logger.error(
+                "\n".join(f"Schema validation error: {error.message}\nPath: {path}"
+                          for error, path in zip(errors, paths)),
+                extra={"event": "validation_failed", "errors": [
+                    {"message": error.message, "path": path} for error, path in zip(errors, paths)
+                ]}
+            )
+        return not errors
+
+    def build_batch_request(self, pdf_stem, text):
+        """Build an OpenAI Batch API request record for a single recipe"""
+        messages = self.prompt_template.format_messages(
+            json_schema=self.schema_json,
+            recipe_text=text
+        )
+        return {
+            "custom_id": pdf_stem,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": self.llm.model_name,
+                "messages": [
+                    {"role": MESSAGE_ROLES[message.type], "content": message.content}
+                    for message in messages
+                ],
+                "response_format": self.response_format
+            }
+        }
 
     def save_json_output(self, data, output_path):
         """Save JSON output to file"""
         try:
-            with open(output_path, 'w') as f:
-                json.dump(data, f, indent=2)
-            print(f"Saved output to: {output_path}")
+            with open(output_path, 'wb') as f:
+                f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+            logger.info(f"Saved output to: {output_path}", extra={"event": "saved", "file": str(output_path)})
             return True
         except Exception as e:
-            print(f"Error saving output: {e}")
+            logger.error(f"Error saving output: {e}")
             return False
 
 
-def main():
-    """Main function to process all recipes"""
-    # Load schema and prompt template
-    try:
-        with open('schema/schema.json', 'r') as f:
-            recipe_schema = json.load(f)
-    except FileNotFoundError:
-        print("⚠️  schema.json not found, using default schema")
-        recipe_schema = None
+def save_recipe_result(extractor, pdf_file, result, output_dir, pdf_hash):
+    """Report the outcome for one PDF and save its result, returning True on success"""
+    if isinstance(result, Exception):
+        logger.error(f"Error processing {pdf_file.name}: {result}",
+                     extra={"event": "error", "file": str(pdf_file), "error": str(result)})
+        result = None
     
-    try:
-        with open('prompts/recipe_extraction_prompt.txt', 'r') as f:
-            prompt_text = f.read()
-    except FileNotFoundError:
-        print("⚠️  recipe_extraction_prompt.txt not found")
-        prompt_text = None
+    if not result:
+        logger.error(f"Failed to process {pdf_file.name}", extra={"event": "failed", "file": str(pdf_file)})
+        return False
     
-    if not prompt_text:
-        raise FileNotFoundError("prompts/recipe_extraction_prompt.txt not found")
+    # Save to JSON file, tagged with the hash of its source PDF
+    result[PDF_HASH_KEY] = pdf_hash
+    return extractor.save_json_output(result, output_dir / f"{pdf_file.stem}.json")
+
+
+async def process_recipes(extractor, pdf_files, output_dir, pdf_hashes, num_llm_workers=NUM_LLM_WORKERS):
+    """Process all recipe PDFs through an extract -> LLM -> save pipeline
+
+    The stages run concurrently and are connected by bounded queues, so
+    decoding one PDF overlaps with waiting on the LLM for others. Returns the
+    number of recipes saved.
+    """
+    pdf_queue = asyncio.Queue()
+    for pdf_file in pdf_files:
+        pdf_queue.put_nowait(pdf_file)
     
-    # Create the prompt template using the loaded text with schema parameter
-    prompt_template = ChatPromptTemplate.from_messages([
-        ("system", prompt_text),
-        ("human", "{recipe_text}")
+    # Bound queue depth to cap how much extracted text is held in memory
+    text_queue = asyncio.Queue(maxsize=2 * num_llm_workers)
+    result_queue = asyncio.Queue(maxsize=2 * num_llm_workers)
+    
+    async def extract_worker(process_pool, inline_executor):
+        while not pdf_queue.empty():
+            pdf_file = pdf_queue.get_nowait()
+            text = await extract_with_strategy(pdf_file, process_pool, inline_executor)
+            await text_queue.put((pdf_file, text))
+    
+    async def llm_worker():
+        while (item := await text_queue.get()) is not None:
+            pdf_file, text = item
+            logger.info(f"Processing: {pdf_file.name}", extra={"event": "processing", "file": str(pdf_file)})
+            if not text:
+                logger.error(f"Failed to extract text from {pdf_file}",
+                             extra={"event": "extract_failed", "file": str(pdf_file)})
+                result = None
+            else:
+                try:
+                    result = await extractor.parse_recipe_text(text)
+                except Exception as e:
+                    result = e
+            await result_queue.put((pdf_file, result))
+    
+    async def writer():
+        successful_extractions = 0
+        while (item := await result_queue.get()) is not None:
+            pdf_file, result = item
+            if save_recipe_result(extractor, pdf_file, result, output_dir, pdf_hashes[pdf_file]):
+                successful_extractions += 1
+        return successful_extractions
+    
+    # Extract text in a process pool (MuPDF serializes work behind a global
+    # lock, so threads don't help), except for tiny PDFs. LLM calls stay in
+    # the main process.
+    num_extract_workers = min(os.cpu_count() or 1, len(pdf_files))
+    with extraction_executors(pdf_files) as (process_pool, inline_executor):
+        writer_task = asyncio.create_task(writer())
+        llm_tasks = [asyncio.create_task(llm_worker()) for _ in range(num_llm_workers)]
+        try:
+            await asyncio.gather(*[
+                extract_worker(process_pool, inline_executor) for _ in range(num_extract_workers)
+            ])
+            
+            # Drain the pipeline stage by stage
+            for _ in llm_tasks:
+                await text_queue.put(None)
+            await asyncio.gather(*llm_tasks)
+            await result_queue.put(None)
+            return await writer_task
+        finally:
+            for task in llm_tasks + [writer_task]:
+                task.cancel()
+
+
+async def process_recipes_combined(extractor, pdf_files, output_dir, pdf_hashes,
+                                   max_prompt_tokens=MAX_COMBINED_PROMPT_TOKENS):
+    """Process all recipe PDFs, packing several recipes into each LLM request
+
+    Returns the number of recipes saved.
+    """
+    with extraction_executors(pdf_files) as (process_pool, inline_executor):
+        texts = await asyncio.gather(*[
+            extract_with_strategy(pdf_file, process_pool, inline_executor)
+            for pdf_file in pdf_files
+        ])
+    
+    # Group recipes so each request stays under the prompt token budget
+    groups = []
+    group, group_tokens = [], extractor.prompt_token_estimate
+    for index, text in enumerate(texts):
+        if not text:
+            logger.error(f"Failed to extract text from {pdf_files[index]}",
+                         extra={"event": "extract_failed", "file": str(pdf_files[index])})
+            continue
+        
+        tokens = len(text) // 4
+        if group and group_tokens + tokens > max_prompt_tokens:
+            groups.append(group)
+            group, group_tokens = [], extractor.prompt_token_estimate
+        group.append(index)
+        group_tokens += tokens
+    if group:
+        groups.append(group)
+    
+    batches = await asyncio.gather(*[
+        extractor.parse_recipe_batch([texts[index] for index in group])
+        for group in groups
     ])
+    
+    results = [None] * len(pdf_files)
+    for group, batch in zip(groups, batches):
+        for index, result in zip(group, batch):
+            results[index] = result
+    
+    successful_extractions = 0
+    for pdf_file, result in zip(pdf_files, results):
+        if save_recipe_result(extractor, pdf_file, result, output_dir, pdf_hashes[pdf_file]):
+            successful_extractions += 1
+    return successful_extractions
 
-    # Initialize the extractor
-    extractor = RecipeExtractor(recipe_schema, prompt_template)
+
+async def run_recipes(extractor, pdf_files, output_dir, pdf_hashes, combine=False):
+    """Process and save all recipe PDFs, then close the shared HTTP client
+
+    With combine, only tiny PDFs are packed into shared LLM requests; larger
+    ones go through the streaming pipeline.
+    """
+    try:
+        if not combine:
+            return await process_recipes(extractor, pdf_files, output_dir, pdf_hashes)
+        
+        tiny_files = [pdf_file for pdf_file in pdf_files if pick_strategy(pdf_file) == "inline"]
+        other_files = [pdf_file for pdf_file in pdf_files if pdf_file not in tiny_files]
+        counts = await asyncio.gather(
+            process_recipes_combined(extractor, tiny_files, output_dir, pdf_hashes),
+            process_recipes(extractor, other_files, output_dir, pdf_hashes)
+        )
+        return sum(counts)
+    finally:
+        await close_http_client()
+
+
+def submit_batch(extractor, pdf_files, batch_input_path=BATCH_INPUT_PATH):
+    """Write one request per PDF to a JSONL file and submit it to the OpenAI Batch API"""
+    with create_process_pool(os.cpu_count()) as executor:
+        texts = executor.map(extract_text_from_pdf, pdf_files, chunksize=1)
+        
+        submitted = 0
+        with open(batch_input_path, 'wb') as f:
+            for pdf_file, text in zip(pdf_files, texts):
+                if not text:
+                    logger.error(f"Failed to extract text from {pdf_file}",
+                                 extra={"event": "extract_failed", "file": str(pdf_file)})
+                    continue
+                f.write(orjson.dumps(extractor.build_batch_request(pdf_file.stem, text)) + b"\n")
+                submitted += 1
+    
+    if not submitted:
+        logger.info("No recipes to submit")
+        return None
+    
+    client = extractor.llm.root_client.with_options(max_retries=BATCH_CLIENT_MAX_RETRIES)
+    with open(batch_input_path, 'rb') as f:
+        batch_file = client.files.create(file=f, purpose="batch")
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    
+    logger.info(f"Submitted {submitted} recipes as batch: {batch.id}",
+                extra={"event": "batch_submitted", "batch_id": batch.id})
+    logger.info(f"Collect results with: python extract.py --collect {batch.id}")
+    return batch.id
+
+
+def collect_batch(extractor, batch_id, output_dir, poll_interval=BATCH_POLL_INTERVAL_SECONDS):
+    """Wait for a submitted batch to finish, then validate and save its results"""
+    client = extractor.llm.root_client.with_options(max_retries=BATCH_CLIENT_MAX_RETRIES)
+    
+    batch = client.batches.retrieve(batch_id)
+    while batch.status not in BATCH_TERMINAL_STATUSES:
+        # request_counts is missing until the batch has been validated
+        counts = batch.request_counts
+        progress = f" ({counts.completed}/{counts.total} done)" if counts else ""
+        logger.info(f"Batch {batch_id} is {batch.status}{progress}, checking again in {poll_interval}s")
+        time.sleep(poll_interval)
+        batch = client.batches.retrieve(batch_id)
+    
+    total_files = batch.request_counts.total if batch.request_counts else 0
+    if batch.status != "completed" or not batch.output_file_id:
+        logger.error(f"Batch {batch_id} finished with status: {batch.status}")
+        return 0, total_files
+    
+    successful_extractions = 0
+    for line in client.files.content(batch.output_file_id).text.splitlines():
+        record = orjson.loads(line)
+        pdf_stem = record["custom_id"]
+        response = record.get("response")
+        
+        if record.get("error") or not response or response["status_code"] != 200:
+            logger.error(f"Failed to process {pdf_stem}: {record.get('error') or response}")
+            continue
+        
+        try:
+            content = response["body"]["choices"][0]["message"]["content"]
+            result = orjson.loads(content)
+        except Exception as e:
+            logger.error(f"Error parsing recipe text for {pdf_stem}: {e}")
+            continue
+        
+        if not extractor.validate_recipe_data(result):
+            logger.error(f"Failed to process {pdf_stem}")
+            continue
+        
+        pdf_file = PDF_DIR / f"{pdf_stem}.pdf"
+        if pdf_file.exists():
+            result[PDF_HASH_KEY] = hash_pdf(pdf_file)
+        
+        if extractor.save_json_output(result, output_dir / f"{pdf_stem}.json"):
+            successful_extractions += 1
+    
+    return successful_extractions, total_files
+
+
+def print_summary(successful_extractions, total_files, output_dir):
+    """Log the run's outcome and print the final processing summary"""
+    logger.info("Processing complete",
+                extra={"event": "summary", "successful": successful_extractions, "total": total_files})
+    flush_logging()
+    
+    print(f"\n{'='*60}\n"
+          "PROCESSING COMPLETE\n"
+          f"{'='*60}\n"
+          f"Successfully processed: {successful_extractions}/{total_files} files\n"
+          f"Output files saved to: {output_dir}\n"
+          f"{'='*60}")
+
+
+def main():
+    """Main function to process all recipes"""
+    parser = argparse.ArgumentParser(description="Extract structured recipe data from PDFs")
+    parser.add_argument("--batch", action="store_true",
+                        help="submit all PDFs as one OpenAI Batch API job (half price, up to 24h turnaround)")
+    parser.add_argument("--collect", metavar="BATCH_ID",
+                        help="wait for a submitted batch job and save its results")
+    parser.add_argument("--combine", action="store_true",
+                        help="pack several recipes into each LLM request to send the system prompt once per group")
+    parser.add_argument("--force", action="store_true",
+                        help="re-extract PDFs even if their output is up to date")
+    parser.add_argument("--fail-fast", action="store_true",
+                        help="stop validating a recipe at its first schema error")
+    args = parser.parse_args()
+    
+    # Log through a queue so worker processes don't interleave output
+    listener = setup_logging()
+    atexit.register(listener.stop)
+    
+    # Create output directory
+    output_dir = OUTPUT_DIR
+    output_dir.mkdir(exist_ok=True)
+    
+    if args.collect:
+        # Save the results of a previously submitted batch job
+        extractor = RecipeExtractor(fail_fast=args.fail_fast)
+        successful_extractions, total_files = collect_batch(extractor, args.collect, output_dir)
+        print_summary(successful_extractions, total_files, output_dir)
+        return
     
     # Get all PDF files from data/input directory
-    pdf_dir = Path("data/input")
-    pdf_files = list(pdf_dir.glob("*.pdf"))
+    pdf_dir = PDF_DIR
+    pdf_files = list_pdfs(pdf_dir)
     
     if not pdf_files:
-        print("No PDF files found in data/input directory")
+        logger.info("No PDF files found in data/input directory")
         return
     
-    # Create output directory
-    output_dir = Path("data/output")
-    output_dir.mkdir(exist_ok=True)
+    # Skip PDFs whose output was already extracted from the same content
+    pdf_hashes = {pdf_file: hash_pdf(pdf_file) for pdf_file in pdf_files}
+    if not args.force:
+        unchanged = [
+            pdf_file for pdf_file in pdf_files
+            if is_output_current(output_dir / f"{pdf_file.stem}.json", pdf_hashes[pdf_file])
+        ]
+        if unchanged:
+            logger.info(f"Skipping {len(unchanged)} unchanged PDF(s), use --force to re-extract")
+            pdf_files = [pdf_file for pdf_file in pdf_files if pdf_file not in unchanged]
+        if not pdf_files:
+            logger.info("All outputs are up to date")
+            return
+    
+    # Load schema and prompt template
+    recipe_schema = load_schema()
+    prompt_template = load_prompt_template()
+    
+    # Initialize the extractor only once there is work to do, since it
+    # imports LangChain and the OpenAI client
+    extractor = RecipeExtractor(recipe_schema, prompt_template, fail_fast=args.fail_fast)
+    
+    if args.batch:
+        submit_batch(extractor, pdf_files)
+        return
     
     # Process each PDF
-    successful_extractions = 0
     total_files = len(pdf_files)
-    
-    for pdf_file in pdf_files:
-        print(f"\n{'='*60}")
-        print(f"Processing: {pdf_file.name}")
-        print(f"{'='*60}")
-        
-        # Process the recipe
-        result = extractor.process_recipe(pdf_file)
-        
-        if result:
-            # Save to JSON file
-            output_file = output_dir / f"{pdf_file.stem}.json"
-            if extractor.save_json_output(result, output_file):
-                successful_extractions += 1
-        else:
-            print(f"Failed to process {pdf_file.name}")
+    successful_extractions = asyncio.run(
+        run_recipes(extractor, pdf_files, output_dir, pdf_hashes, combine=args.combine)
+    )
+    logger.info(f"LLM requests: {extractor.scheduler.status()}",
+                extra={"event": "llm_requests", **extractor.scheduler.counters()})
     
     # Print final summary
-    print(f"\n{'='*60}")
-    print("PROCESSING COMPLETE")
-    print(f"{'='*60}")
-    print(f"Successfully processed: {successful_extractions}/{total_files} files")
-    print(f"Output files saved to: {output_dir}")
-    print(f"{'='*60}")
+    print_summary(successful_extractions, total_files, output_dir)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file